@@ -37,8 +37,12 @@ setup(
         'Programming Language :: Python :: Implementation :: CPython',
         'Programming Language :: Python :: Implementation :: PyPy'
     ],
-    py_modules=["newick"],
+    # newick_async requires Python >= 3.6 - importing it on older versions fails.
+    py_modules=["newick", "newick_async"],
     install_requires=[],
+    entry_points={
+        'console_scripts': ['newick-validate=newick:main'],
+    },
     extras_require={
         'dev': [
             'flake8',
@@ -5,13 +5,26 @@ Functionality to read and write the Newick serialization format for trees.
 .. seealso:: https://en.wikipedia.org/wiki/Newick_format
 """
 from __future__ import unicode_literals
+import argparse
+import codecs
+import copy
+import hashlib
 import io
+import multiprocessing
+import os
 import re
+import sys
+from array import array
+from collections import namedtuple, OrderedDict, Counter
 
 __version__ = "0.9.3.dev0"
 
 RESERVED_PUNCTUATION = ':;,()'
 COMMENT = re.compile('\[[^\]]*\]')
+# Whitespace after a vertical line, to be shortened when followed by a box drawing character:
+_ASCII_ART_SPACE = re.compile('(?<=\u2502)\\s(?=\\s*[\u250c\u2514\u2502])')
+_ASCII_ART_STRICT = dict((ord(u), a) for u, a in zip(
+    '\u2500\u2502\u250c\u2514\u251c\u2524\u253c', '-|/\\||+'))
 
 
 def length_parser(x):
@@ -30,21 +43,26 @@ class Node(object):
     descendants. It further has an ancestor, which is *None* if the node is the
     root node of a tree.
     """
-    def __init__(self, name=None, length=None, **kw):
+    def __init__(self, name=None, length=None, comment=None, **kw):
         """
-        :param name: Node label.
+        :param name: Node label; quoted labels may contain reserved punctuation.
         :param length: Branch length from the new node to its parent.
+        :param comment: Text of a comment attached to the node, without the enclosing \
+        square brackets.
         :param kw: Recognized keyword arguments:\
             `length_parser`: Custom parser for the `length` attribute of a Node.\
             `length_formatter`: Custom formatter for the branch length when formatting a\
             Node as Newick string.
         """
+        quoted = name and len(name) > 1 and name[0] == name[-1] == "'"
         for char in RESERVED_PUNCTUATION:
-            if (name and char in name) or (length and char in length):
+            if (name and not quoted and char in name) or (length and char in length):
                 raise ValueError(
                     'Node names or branch lengths must not contain "%s"' % char)
         self.name = name
         self._length = length
+        self.comment = comment
+        self._annotations = None
         self.descendants = []
         self.ancestor = None
         self._length_parser = kw.pop('length_parser', length_parser)
@@ -53,6 +71,83 @@ class Node(object):
     def __repr__(self):
         return 'Node("%s")' % self.name
 
+    def __deepcopy__(self, memo):
+        """
+        Copy the (sub)tree rooted at self iteratively. All copied nodes are registered in
+        `memo`, and nodes already copied are reused, so copying several nodes of one tree
+        together yields nodes of one copied tree.
+        """
+        root = memo.get(id(self))
+        if root is not None:
+            return root
+        root = self._copy_node(memo)
+        stack = [(self, root)]
+        while stack:
+            node, clone = stack.pop()
+            for n in node.descendants:
+                c = memo.get(id(n))
+                if c is None:
+                    c = n._copy_node(memo)
+                    stack.append((n, c))
+                clone.add_descendant(c)
+        return root
+
+    def __reduce__(self):
+        """
+        Pickle the tree rooted at self as flat lists in preorder, so that neither pickling
+        nor unpickling recurses through the tree.
+
+        Nodes with an ancestor are pickled as the root of their tree together with the path
+        to the node, thus nodes of one tree pickled together are unpickled as nodes of one
+        tree.
+        """
+        if self.ancestor is not None:
+            path, node = [], self
+            while node.ancestor is not None:
+                path.append([d is node for d in node.ancestor.descendants].index(True))
+                node = node.ancestor
+            return _unpickle_descendant, (node, path[::-1])
+        nodes = self._preorder()
+        funcs, extra = [], []
+        for n in nodes:
+            f = (n._length_parser, n._length_formatter)
+            if not funcs or f != funcs[0]:
+                funcs.append(f)
+            extra.append(dict(
+                (k, v) for k, v in n.__dict__.items() if k not in _NODE_ATTRIBUTES))
+        if len(funcs) > 1:
+            funcs = [(n._length_parser, n._length_formatter) for n in nodes]
+        return _unpickle_tree, (
+            self.__class__,
+            array('i', [len(n.descendants) for n in nodes]),
+            [n.name for n in nodes],
+            [n._length for n in nodes],
+            [n._formatted_comment() for n in nodes],
+            funcs,
+            extra if any(extra) else None)
+
+    @property
+    def unquoted_name(self):
+        """The node label with enclosing quotes removed and escaped quotes resolved."""
+        return _unquote(self.name)
+
+    @property
+    def annotations(self):
+        """
+        Dictionary of the key-value pairs in `[&...]` and `[&&NHX:...]` comments.
+
+        The comment is decoded on first access only; changes to the dictionary are written
+        back when formatting the node as Newick string.
+        """
+        if self._annotations is None or self._annotations[0] is not self.comment:
+            self._annotations = (self.comment, _parse_annotations(self.comment))
+        return self._annotations[1]
+
+    def _formatted_comment(self):
+        if self._annotations is not None and self._annotations[0] is self.comment:
+            return _format_annotations(self.comment, self._annotations[1])
+        return self.comment
+
     @property
     def length(self):
         return self._length_parser(self._length)
@@ -84,62 +179,302 @@ class Node(object):
         node.ancestor = self
         self.descendants.append(node)
 
+    def _copy_node(self, memo=None):
+        """
+        Return a copy of the node, without ancestor and descendants.
+
+        :param memo: `copy.deepcopy` memo dictionary; if not `None`, the copy is registered \
+        in it and attributes other than the ones managed by `Node` are deep-copied.
+        """
+        node = self.__class__.__new__(self.__class__)
+        node.__dict__.update(self.__dict__)
+        if memo is not None:
+            memo[id(self)] = node
+            for k, v in self.__dict__.items():
+                if k not in _NODE_ATTRIBUTES:
+                    node.__dict__[k] = copy.deepcopy(v, memo)
+        node.descendants, node.ancestor = [], None
+        if self._annotations is not None:
+            node._annotations = (self._annotations[0], dict(self._annotations[1]))
+        return node
+
+    def copy(self):
+        """
+        Create a deep copy of the (sub)tree rooted at self.
+
+        :return: `Node` instance, the root of the copied tree.
+        """
+        return self.__deepcopy__({})
+
+    def _get_nodes(self, nodes):
+        """
+        Resolve a Node, a node name or a list of Node objects or node names into a non-empty
+        list of Nodes.
+        """
+        if isinstance(nodes, (Node, type(''), type(b''))):
+            nodes = [nodes]
+        nodes = list(nodes)
+        res = [n for n in nodes if isinstance(n, Node)]
+        names = set(n for n in nodes if not isinstance(n, Node))
+        if names:
+            found = [n for n in self._preorder() if n.name in names]
+            missing = names.difference(n.name for n in found)
+            if missing:
+                raise ValueError('no nodes named %s' % ', '.join(sorted(missing)))
+            res.extend(found)
+        if not res:
+            raise ValueError('no matching nodes')
+        return res
+
+    def _mrca(self, nodes):
+        """Return the most recent common ancestor of nodes within the subtree of self."""
+        path, n = [], nodes[0]
+        while n is not self:
+            if n is None:
+                raise ValueError('%r is not in the subtree' % nodes[0])
+            path.append(n)
+            n = n.ancestor
+        path.append(self)
+        index, res = dict((id(n), i) for i, n in enumerate(path)), 0
+        for node in nodes[1:]:
+            n = node
+            while id(n) not in index:
+                if n is None:
+                    raise ValueError('%r is not in the subtree' % node)
+                n = n.ancestor
+            res = max(res, index[id(n)])
+        return path[res]
+
+    def reroot(self, outgroup):
+        """
+        Reroot the tree in-place, placing the root on the branch above the outgroup.
+
+        Only the path from the outgroup up to self is modified: along this path ancestors
+        become descendants, taking over the branch lengths of the reversed branches. The
+        branch length above the outgroup stays with the outgroup. `self` remains the root
+        node, its former label and descendants are moved to a new node - which is removed
+        if it ends up with less than two descendants.
+
+        :param outgroup: A Node, a node name or a list of Node objects or names, in which \
+        case the outgroup is the most recent common ancestor of the nodes.
+        """
+        target = self._mrca(self._get_nodes(outgroup))
+        if target is self:
+            raise ValueError('cannot reroot on the root node')
+
+        path, n = [], target
+        while n is not self:
+            path.append(n)
+            n = n.ancestor
+        old = self._copy_node()
+        for n in self.descendants:
+            old.add_descendant(n)
+
+        # The former ancestors of the nodes on the path, to be attached in reverse order:
+        chain = path[1:] + [old]
+        for n, parent in zip(path, chain):
+            parent.descendants.remove(n)
+        lengths = [n._length for n in path]
+        chain[0]._length = None
+        for i in range(1, len(chain)):
+            chain[i]._length = lengths[i]
+            chain[i - 1].add_descendant(chain[i])
+        self.name, self._length, self.comment, self._annotations = None, None, None, None
+        self.descendants = []
+        self.add_descendant(target)
+        self.add_descendant(chain[0])
+
+        n = old
+        while n is not self and len(n.descendants) < 2:
+            parent = n.ancestor
+            i = [d is n for d in parent.descendants].index(True)
+            if n.descendants:
+                child = n.descendants[0]
+                if n._length:
+                    child.length += n.length
+                parent.descendants[i] = child
+                child.ancestor = parent
+            else:
+                del parent.descendants[i]
+            n = parent
+
+    def ladderize(self, reverse=False):
+        """
+        Sort the descendants of all nodes in the subtree by the number of leaves they
+        contain, in-place.
+
+        :param reverse: Flag signaling whether to put the largest subtrees first.
+        """
+        nodes, size = self._preorder(), {}
+        for n in reversed(nodes):
+            size[id(n)] = sum(size[id(d)] for d in n.descendants) or 1
+        for n in nodes:
+            if len(n.descendants) > 1:
+                n.descendants.sort(key=lambda d: size[id(d)], reverse=reverse)
+
+    def induced_subtree(self, leaves):
+        """
+        Create the minimal subtree spanning the specified nodes as new tree.
+
+        Only the paths from the specified nodes up to self are visited. Nodes with a single
+        descendant are removed from the result, their branch lengths added to the
+        descendant's. The root of the result has no branch length.
+
+        :param leaves: A Node, a node name or a list of Node objects or node names.
+        :return: `Node` instance, the root of the new tree.
+        """
+        nodes = self._get_nodes(leaves)
+        chosen, marked = set(id(n) for n in nodes), set()
+        for node in nodes:
+            n = node
+            while id(n) not in marked:
+                marked.add(id(n))
+                if n is self:
+                    break
+                n = n.ancestor
+                if n is None:
+                    raise ValueError('%r is not in the subtree' % node)
+
+        def descend(n):
+            """Follow n down a chain of nodes with a single marked descendant."""
+            chain = [n]
+            while id(n) not in chosen:
+                marked_descendants = [d for d in n.descendants if id(d) in marked]
+                if len(marked_descendants) != 1:
+                    break
+                n = marked_descendants[0]
+                chain.append(n)
+            return n, chain
+
+        root = descend(self)[0]
+        memo = {}
+        res = root._copy_node(memo)
+        res._length = None  # The branch above the root is not part of the spanning tree.
+        stack = [(root, res)]
+        while stack:
+            node, clone = stack.pop()
+            for n in node.descendants:
+                if id(n) in marked:
+                    n, chain = descend(n)
+                    c = n._copy_node(memo)
+                    if len(chain) > 1 and any(m._length for m in chain):
+                        c.length = sum(m.length for m in chain)
+                    clone.add_descendant(c)
+                    stack.append((n, c))
+        return res
+
     @property
     def newick(self):
         """The representation of the Node in Newick format."""
         label = self.name or ''
         if self._length:
             label += ':' + self._length
+        comment = self._formatted_comment()
+        if comment is not None:
+            label += '[' + comment + ']'
         descendants = ','.join([n.newick for n in self.descendants])
         if descendants:
             descendants = '(' + descendants + ')'
         return descendants + label
 
-    def _ascii_art(self, char1='\u2500', show_internal=True, maxlen=None):
-        if maxlen is None:
-            maxlen = max(
-                len(n.name) for n in self.walk()
-                if n.name and (show_internal or n.is_leaf)) + 4
+    def _ascii_art(self, show_internal=True, maxdepth=None):
+        """
+        Lay out the tree as ASCII art, yielding the lines - before normalization - one by
+        one.
+
+        The layout is computed in one pass over the (displayed) nodes in reverse preorder.
+        Each line is then assembled from the precomputed segments contributed by the
+        nodes on the path from the root to the node drawn in the line.
+        """
+        # Layout: [node, displayed descendants, label, height, mid, lo, hi, child offsets]
+        layout, stack = [], [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            descendants = node.descendants
+            label = node.name or ''
+            if descendants and maxdepth is not None and depth >= maxdepth:
+                label += ' (%s leaves)' % sum(
+                    1 for n in node._preorder() if not n.descendants)
+                descendants = []
+            layout.append([node, descendants, label, 1, 0, 0, 0, None])
+            stack.extend((n, depth + 1) for n in reversed(descendants))
+
+        info = dict((id(entry[0]), entry) for entry in layout)
+        for entry in reversed(layout):
+            if entry[1]:
+                children, offsets, height = [info[id(n)] for n in entry[1]], [], 0
+                for c in children:
+                    offsets.append(height)
+                    height += c[3] + 1
+                entry[1], entry[3], entry[7] = children, height - 1, offsets
+                entry[5], entry[6] = offsets[0] + children[0][4], offsets[-1] + children[-1][4]
+                entry[4] = (entry[5] + entry[6]) // 2
+
+        labels = [entry[2] for entry in layout if show_internal or not entry[1]]
+        maxlen = max([len(label) for label in labels if label] or [0]) + 4
         pad = ' ' * (maxlen - 1)
-        namestr = '\u2500' + (self.name or '')
-
-        if self.descendants:
-            mids = []
-            result = []
-            for i, c in enumerate(self.descendants):
-                if len(self.descendants) == 1:
-                    char2 = '\u2500'
-                elif i == 0:
-                    char2 = '\u250c'
-                elif i == len(self.descendants) - 1:
-                    char2 = '\u2514'
-                else:
-                    char2 = '\u2500'
-                clines, mid = c._ascii_art(
-                    char1=char2, show_internal=show_internal, maxlen=maxlen)
-                mids.append(mid + len(result))
-                result.extend(clines)
-                result.append('')
-            result.pop()
-            lo, hi, end = mids[0], mids[-1], len(result)
-            prefixes = [pad] * (lo + 1) +\
-                       [pad + '\u2502'] * (hi - lo - 1) + \
-                       [pad] * (end - hi)
-            mid = (lo + hi) // 2
-            prefixes[mid] = char1 + '\u2500' * (len(prefixes[mid]) - 2) + prefixes[mid][-1]
-            result = [p + l for p, l in zip(prefixes, result)]
-            if show_internal:
-                stem = result[mid]
-                result[mid] = stem[0] + namestr + stem[len(namestr) + 1:]
-            return result, mid
-        return [char1 + namestr], 0
+        padbar = pad + '\u2502'
 
-    def ascii_art(self, strict=False, show_internal=True):
+        def mid_segment(entry, char1):
+            if not entry[1]:
+                return char1 + '\u2500' + entry[2]
+            mid = padbar if entry[5] < entry[4] < entry[6] else pad
+            mid = char1 + '\u2500' * (len(mid) - 2) + mid[-1]
+            if show_internal:
+                namestr = '\u2500' + entry[2]
+                mid = mid[0] + namestr + mid[len(namestr) + 1:]
+            return mid
+
+        # The segment a node contributes to a line changes only in a few rows - where the
+        # vertical line starts and ends and around the node's own (mid) row. So we register
+        # these changes as events for the rows and keep the current segments in a list.
+        frames, segments, events, mids, row = [], [], {}, set(), 0
+
+        def push(entry, char1):
+            # [layout, start row, index of next descendant, segment in the mid row]
+            f = [entry, row, 0, mid_segment(entry, char1)]
+            frames.append(f)
+            segments.append(segment(f, row))
+            mids.add(row + entry[4])
+            for r in set([entry[5] + 1, entry[4], entry[4] + 1, entry[6]]):
+                if 0 < r < entry[3]:
+                    events.setdefault(row + r, []).append(len(frames) - 1)
+
+        def segment(f, row):
+            entry, row = f[0], row - f[1]
+            if row == entry[4]:
+                return f[3]
+            return padbar if entry[5] < row < entry[6] else pad
+
+        push(layout[0], '\u2500')
+        while frames:
+            f = frames[-1]
+            entry, i = f[0], f[2]
+            if entry[1] and row - f[1] == entry[7][i]:
+                n = len(entry[1])
+                f[2] += 1
+                push(entry[1][i], '\u2500' if n == 1 or 0 < i < n - 1 else (
+                    '\u250c' if i == 0 else '\u2514'))
+                continue
+            # A leaf line or a separator line between the subtrees of two descendants.
+            # The latter are skipped, unless one of the nodes is drawn in this line.
+            if not entry[1] or row in mids:
+                yield ''.join(segments)
+            row += 1
+            while frames and row - frames[-1][1] == frames[-1][0][3]:
+                frames.pop()
+                segments.pop()
+            for index in events.pop(row, []):
+                segments[index] = segment(frames[index], row)
+
+    def ascii_art(self, strict=False, show_internal=True, maxdepth=None):
         """
         Return a unicode string representing a tree in ASCII art fashion.
 
         :param strict: Use ASCII characters strictly (for the tree symbols).
         :param show_internal: Show labels of internal nodes.
+        :param maxdepth: Collapse subtrees below the given depth into single nodes, \
+        labeled with the number of leaves in the subtree.
         :return: unicode string
 
         >>> node = loads('((A,B)C,((D,E)F,G,H)I)J;')[0]
@@ -154,29 +489,27 @@ class Node(object):
                 |-G
                 \-H
         """
-        cmap = {
-            '\u2500': '-',
-            '\u2502': '|',
-            '\u250c': '/',
-            '\u2514': '\\',
-            '\u251c': '|',
-            '\u2524': '|',
-            '\u253c': '+',
-        }
-
-        def normalize(line):
-            m = re.compile('(?<=\u2502)(?P<s>\s+)(?=[\u250c\u2514\u2502])')
-            line = m.sub(lambda m: m.group('s')[1:], line)
-            line = re.sub('\u2500\u2502', '\u2500\u2524', line)  # -|
-            line = re.sub('\u2502\u2500', '\u251c', line)  # |-
-            line = re.sub('\u2524\u2500', '\u253c', line)  # -|-
+        return '\n'.join(self.ascii_art_lines(
+            strict=strict, show_internal=show_internal, maxdepth=maxdepth))
+
+    def ascii_art_lines(self, strict=False, show_internal=True, maxdepth=None):
+        """
+        Generate the lines of the ASCII art representation of a tree one by one, e.g. to
+        write them to a file without assembling the full string in memory.
+
+        :param strict: Use ASCII characters strictly (for the tree symbols).
+        :param show_internal: Show labels of internal nodes.
+        :param maxdepth: Collapse subtrees below the given depth into single nodes.
+        :return: Generator of unicode strings.
+        """
+        for line in self._ascii_art(show_internal=show_internal, maxdepth=maxdepth):
+            line = _ASCII_ART_SPACE.sub('', line)
+            line = line.replace('\u2500\u2502', '\u2500\u2524')  # -|
+            line = line.replace('\u2502\u2500', '\u251c')  # |-
+            line = line.replace('\u2524\u2500', '\u253c')  # -|-
             if strict:
-                for u, a in cmap.items():
-                    line = line.replace(u, a)
-            return line
-        return '\n'.join(
-            normalize(l) for l in self._ascii_art(show_internal=show_internal)[0]
-            if set(l) != {' ', '\u2502'})  # remove lines of only spaces and pipes
+                line = line.translate(_ASCII_ART_STRICT)
+            yield line
 
     @property
     def is_leaf(self):
@@ -206,6 +539,15 @@ class Node(object):
                 for n in node.walk():
                     yield n
 
+    def _preorder(self):
+        """Return the list of nodes of the (sub)tree rooted at self in preorder."""
+        res, stack = [], [self]
+        while stack:
+            node = stack.pop()
+            res.append(node)
+            stack.extend(reversed(node.descendants))
+        return res
+
     def visit(self, visitor, predicate=None, **kw):
         """
         Apply a function to matching nodes in the (sub)tree rooted at self.
@@ -357,6 +699,113 @@ class Node(object):
         self.visit(lambda n: setattr(n, 'length', None))
 
 
+_NODE_ATTRIBUTES = {
+    'name', '_length', 'comment', '_annotations', 'descendants', 'ancestor',
+    '_length_parser', '_length_formatter'}
+
+
+def _unpickle_tree(cls, counts, names, lengths, comments, funcs, extra):
+    """
+    Rebuild a tree from the flat lists created by `Node.__reduce__` in a single pass.
+    """
+    root, stack = None, []
+    for i, count in enumerate(counts):
+        node = cls.__new__(cls)
+        node.name, node._length, node.comment = names[i], lengths[i], comments[i]
+        node._annotations, node.descendants, node.ancestor = None, [], None
+        node._length_parser, node._length_formatter = funcs[i if len(funcs) > 1 else 0]
+        if extra:
+            node.__dict__.update(extra[i])
+        if stack:
+            stack[-1][0].add_descendant(node)
+            stack[-1][1] -= 1
+            if not stack[-1][1]:
+                stack.pop()
+        else:
+            root = node
+        if count:
+            stack.append([node, count])
+    return root
+
+
+def _unpickle_descendant(root, path):
+    """
+    Return the node of an unpickled tree, specified by the indices of the descendants on the
+    path from the root.
+    """
+    for i in path:
+        root = root.descendants[i]
+    return root
+
+
+class TreeSplitter(object):
+    """
+    Incrementally split Newick formatted text, fed in chunks of arbitrary size, into the
+    texts of individual trees - without tokenizing the text or keeping more than the text
+    of the incomplete tree in memory.
+
+    >>> splitter = TreeSplitter()
+    >>> splitter.feed("(A,'B;')C;(D")
+    ["(A,'B;')C;"]
+    >>> splitter.feed(',E);')
+    ['(D,E);']
+    """
+    _special = re.compile(r"[(),:;\[\]']")
+    _text = re.compile(r'\S')
+
+    def __init__(self):
+        # One of None (between tokens), "t" (in an unquoted label or length), "'" (in a
+        # quoted label) or "[" (in a comment):
+        self._state = None
+        self._buffer = []
+        self._last = ''
+
+    def feed(self, chunk):
+        """
+        :param chunk: Text to append to the input.
+        :return: List of the texts of the trees completed by `chunk`, including ";".
+        """
+        res, start, end, state = [], 0, 0, self._state
+        for m in self._special.finditer(chunk):
+            c, i = m.group(), m.start()
+            if state is None and self._text.search(chunk, end, i):
+                state = 't'
+            end = i + 1
+            if state == "'":
+                if c == "'" and (chunk[i - 1] if i else self._last) != '\\':
+                    state = None
+            elif state == '[':
+                if c == ']':
+                    state = None
+            elif c == ';':
+                self._buffer.append(chunk[start:i + 1])
+                res.append(''.join(self._buffer))
+                self._buffer, start, state = [], i + 1, None
+            elif c == ':':
+                state = 't'
+            elif c == '[':
+                state = c
+            elif c == "'":
+                # Apostrophes within unquoted labels - like "O'Brien" - don't start quotes.
+                state = state or c
+            elif c != ']':
+                state = None
+        if state is None and self._text.search(chunk, end):
+            state = 't'
+        self._state = state
+        if start < len(chunk):
+            self._buffer.append(chunk[start:])
+        self._last = chunk[-1:] or self._last
+        return res
+
+    def close(self):
+        """
+        :return: List with the text of the last tree, if not terminated by ";".
+        """
+        rest, self._buffer, self._state = ''.join(self._buffer), [], None
+        return [rest] if rest.strip() else []
+
+
 def loads(s, strip_comments=False, **kw):
     """
     Load a list of trees from a Newick formatted string.
@@ -367,8 +816,7 @@ def loads(s, strip_comments=False, **kw):
     :param kw: Keyword arguments are passed through to `Node.create`.
     :return: List of Node objects.
     """
-    kw['strip_comments'] = strip_comments
-    return [parse_node(ss.strip(), **kw) for ss in s.split(';') if ss.strip()]
+    return list(_parse_trees(_tokenize(s), strip_comments=strip_comments, **kw))
 
 
 def dumps(trees):
@@ -421,31 +869,657 @@ def write(tree, fname, encoding='utf8'):
         dump(tree, fp)
 
 
-def _parse_name_and_length(s):
-    l = None
-    if ':' in s:
-        s, l = s.split(':', 1)
-    return s or None, l or None
+class TreeCache(object):
+    """
+    LRU cache of parsed trees, for programs reading the same Newick data repeatedly.
+
+    Files are keyed by path, modification time and size, strings by a hash of their content
+    - in both cases together with the keyword arguments used for parsing. Callers always
+    get copies of the cached trees, so modifying them in-place does not affect the cache.
+
+    >>> cache = TreeCache(max_nodes=100000)
+    >>> cache.loads('(A,B)C;')[0].newick
+    '(A,B)C'
+    >>> cache.loads('(A,B)C;')[0].newick
+    '(A,B)C'
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+    def __init__(self, max_nodes=None, max_bytes=None):
+        """
+        :param max_nodes: Maximal total number of nodes of the cached trees or `None`.
+        :param max_bytes: Maximal total size in bytes of the Newick texts of the cached \
+        trees - UTF-8 encoded for strings - or `None`.
+        """
+        self.max_nodes = max_nodes
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nodes = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.nodes = self.bytes = 0
+
+    def _get(self, key, size, parse):
+        if key in self._entries:
+            self.hits += 1
+            entry = self._entries.pop(key)
+            self._entries[key] = entry  # Mark as most recently used.
+        else:
+            self.misses += 1
+            trees = parse()
+            entry = (trees, sum(len(t._preorder()) for t in trees), size)
+            if (self.max_nodes is not None and entry[1] > self.max_nodes) or \
+                    (self.max_bytes is not None and entry[2] > self.max_bytes):
+                return trees  # Too large to cache, so there's no need to copy.
+            self._entries[key] = entry
+            self.nodes += entry[1]
+            self.bytes += entry[2]
+            while (self.max_nodes is not None and self.nodes > self.max_nodes) or \
+                    (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, nodes, size) = self._entries.popitem(last=False)
+                self.nodes -= nodes
+                self.bytes -= size
+        return [tree.copy() for tree in entry[0]]
+
+    def read(self, fname, encoding='utf8', strip_comments=False, **kw):
+        """
+        Cached version of `read`.
+        """
+        stat = os.stat(fname)
+        key = ('read', os.path.abspath(fname), stat.st_mtime, stat.st_size, encoding,
+               strip_comments, tuple(sorted(kw.items())))
+        return self._get(
+            key,
+            stat.st_size,
+            lambda: read(fname, encoding=encoding, strip_comments=strip_comments, **kw))
+
+    def loads(self, s, strip_comments=False, **kw):
+        """
+        Cached version of `loads`.
+        """
+        data = s.encode('utf8')
+        key = ('loads', hashlib.sha1(data).hexdigest(), strip_comments,
+               tuple(sorted(kw.items())))
+        return self._get(
+            key, len(data), lambda: loads(s, strip_comments=strip_comments, **kw))
+
+
+class TreeCollection(object):
+    """
+    A collection of trees, stored compactly as flat lists in preorder, like pickled trees,
+    with node names interned in one table shared by all trees.
+
+    Operations on all trees work on the flat lists directly - without creating `Node`
+    objects - and can be distributed over a pool of processes.
+    """
+    def __init__(self, trees=None, **kw):
+        """
+        :param trees: Iterable of Node objects.
+        :param kw: Recognized keyword arguments: `length_parser` and `length_formatter`, \
+        used when computing tree lengths and creating `Node` objects from the collection.
+        """
+        self.names = []
+        self._ids = {}
+        self._trees = []
+        self._length_parser = kw.get('length_parser', length_parser)
+        self._length_formatter = kw.get('length_formatter', length_formatter)
+        for tree in trees or []:
+            self.append(tree)
+
+    @classmethod
+    def read(cls, fname, encoding='utf8', strip_comments=False, **kw):
+        """
+        Create a collection from a Newick formatted file, parsing one tree at a time.
+
+        :param kw: Keyword arguments are passed through to `loads` and `TreeCollection`.
+        """
+        res, splitter = cls(**kw), TreeSplitter()
+        with io.open(fname, encoding=encoding) as fp:
+            for chunk in iter(lambda: fp.read(2 ** 16), ''):
+                for text in splitter.feed(chunk):
+                    res.extend(loads(text, strip_comments=strip_comments, **kw))
+        for text in splitter.close():
+            res.extend(loads(text, strip_comments=strip_comments, **kw))
+        return res
+
+    @classmethod
+    def loads(cls, s, strip_comments=False, **kw):
+        """
+        Create a collection from a Newick formatted string.
+
+        :param kw: Keyword arguments are passed through to `loads` and `TreeCollection`.
+        """
+        return cls(loads(s, strip_comments=strip_comments, **kw), **kw)
+
+    def __len__(self):
+        return len(self._trees)
+
+    def __getitem__(self, index):
+        """
+        :return: A new `Node` object for the tree at `index`.
+        """
+        counts, ids, lengths, comments = self._trees[index]
+        return _unpickle_tree(
+            Node,
+            counts,
+            [None if i < 0 else self.names[i] for i in ids],
+            lengths,
+            comments or [None] * len(counts),
+            [(self._length_parser, self._length_formatter)],
+            None)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, tree):
+        """
+        Add a tree to the collection.
+
+        :param tree: Node object.
+        """
+        nodes, ids = tree._preorder(), []
+        for n in nodes:
+            if n.name is None:
+                ids.append(-1)
+            else:
+                if n.name not in self._ids:
+                    self._ids[n.name] = len(self.names)
+                    self.names.append(n.name)
+                ids.append(self._ids[n.name])
+        comments = [n._formatted_comment() for n in nodes]
+        self._trees.append((
+            array('i', [len(n.descendants) for n in nodes]),
+            array('i', ids),
+            [n._length for n in nodes],
+            comments if any(c is not None for c in comments) else None))
+
+    def extend(self, trees):
+        for tree in trees:
+            self.append(tree)
+
+    @staticmethod
+    def _map(func, args, processes):
+        if not processes:
+            return [func(arg) for arg in args]
+        pool = multiprocessing.Pool(processes)
+        try:
+            return pool.map(func, args, chunksize=max(1, len(args) // (4 * processes)))
+        finally:
+            pool.close()
+            pool.join()
+
+    def tip_counts(self):
+        """
+        :return: List of the numbers of leaves of the trees.
+        """
+        return [counts.count(0) for counts, _, _, _ in self._trees]
+
+    def leaf_names(self):
+        """
+        :return: List of the lists of leaf names of the trees.
+        """
+        return [[self.names[i] for c, i in zip(counts, ids) if c == 0 and i >= 0]
+                for counts, ids, _, _ in self._trees]
 
+    def tree_lengths(self, processes=None):
+        """
+        :param processes: Number of worker processes to use or `None`.
+        :return: List of the sums of the branch lengths of the trees (excluding the branch \
+        above the root).
+        """
+        return self._map(
+            _flat_tree_length,
+            [(t[2], self._length_parser) for t in self._trees],
+            processes)
+
+    def clade_frequencies(self, processes=None):
+        """
+        Compute the frequencies of the clades - i.e. the sets of leaf names of the subtrees
+        rooted at internal nodes - across the collection.
+
+        :param processes: Number of worker processes to use or `None`.
+        :return: `dict` mapping clades, as `frozenset` of leaf names, to the fraction of \
+        trees containing the clade.
+        """
+        counter = Counter()
+        for clades in self._map(_flat_clades, self._trees, processes):
+            counter.update(clades)
+        return {
+            frozenset(self.names[i] for i in clade): count / float(len(self._trees))
+            for clade, count in counter.items()}
+
+    def prune_by_names(self, leaf_names, inverse=False, processes=None):
+        """
+        Remove the leaves with the given names - or, if inverse=True, all other leaves -
+        from all trees. Internal nodes left without descendants are removed as well.
 
-def _parse_siblings(s, **kw):
+        :param leaf_names: A list of leaf names (strings).
+        :param inverse: Specifies whether to remove nodes in the list or not in the list.
+        :param processes: Number of worker processes to use or `None`.
+        """
+        ids = set(self._ids[n] for n in leaf_names if n in self._ids)
+        self._trees = self._map(
+            _flat_prune, [(t, ids, inverse) for t in self._trees], processes)
+
+    def remove_lengths(self):
+        """
+        Set the length of all nodes in all trees to None.
+        """
+        self._trees = [(c, i, [None] * len(c), cm) for c, i, _, cm in self._trees]
+
+
+def _flat_parents(counts):
     """
-    http://stackoverflow.com/a/26809037
+    :return: List of the indices of the parents of the nodes of a tree given by the numbers \
+    of descendants in preorder; the root's parent is -1.
     """
-    bracket_level = 0
-    current = []
+    parents, stack = [-1] * len(counts), []
+    for i, count in enumerate(counts):
+        if stack:
+            parents[i] = stack[-1][0]
+            stack[-1][1] -= 1
+            if not stack[-1][1]:
+                stack.pop()
+        if count:
+            stack.append([i, count])
+    return parents
+
+
+def _flat_tree_length(args):
+    lengths, parser = args
+    return sum(parser(length) for length in lengths[1:])
 
-    # trick to remove special-case of trailing chars
-    for c in (s + ","):
-        if c == "," and bracket_level == 0:
-            yield parse_node("".join(current), **kw)
-            current = []
+
+def _flat_clades(tree):
+    """
+    :return: Set of the clades of the tree as `frozenset` of name indices.
+    """
+    counts, ids = tree[0], tree[1]
+    # The leaves of a subtree are contiguous in preorder, so we only need the subtree sizes
+    # and the positions of the named leaves.
+    parents, sizes, leaves, first = _flat_parents(counts), [1] * len(counts), [], []
+    for i in range(len(counts) - 1, 0, -1):
+        sizes[parents[i]] += sizes[i]
+    for count, i in zip(counts, ids):
+        first.append(len(leaves))
+        if not count and i >= 0:
+            leaves.append(i)
+    first.append(len(leaves))
+    res = set()
+    for i, count in enumerate(counts):
+        if count:
+            clade = frozenset(leaves[first[i]:first[i + sizes[i]]])
+            if len(clade) > 1:
+                res.add(clade)
+    return res
+
+
+def _flat_prune(args):
+    (counts, ids, lengths, comments), prune, inverse = args
+    parents, kept, keep = _flat_parents(counts), [0] * len(counts), [True] * len(counts)
+    for i in range(len(counts) - 1, 0, -1):
+        keep[i] = kept[i] > 0 if counts[i] else (ids[i] in prune) == inverse
+        if keep[i]:
+            kept[parents[i]] += 1
+    index = [i for i, k in enumerate(keep) if k]
+    return (
+        array('i', [kept[i] for i in index]),
+        array('i', [ids[i] for i in index]),
+        [lengths[i] for i in index],
+        [comments[i] for i in index] if comments else None)
+
+
+_OFFSET_IN_MESSAGE = re.compile('(.+) at offset ([0-9]+)$')
+# Undecodable bytes are decoded to - and encoded back from - lone surrogates, so byte
+# offsets can be computed from the decoded text. Python 2 lacks this error handler.
+if sys.version_info[0] > 2:
+    _DECODE_ERRORS, _UNDECODABLE = 'surrogateescape', re.compile('[\udc80-\udcff]')
+else:  # pragma: no cover
+    _DECODE_ERRORS, _UNDECODABLE = 'replace', re.compile('\ufffd')
+ValidationReport = namedtuple(
+    'ValidationReport', 'index offset tips internal_nodes max_depth problems')
+
+
+def validate(fname, encoding='utf8', length_parser=length_parser, chunk_size=2 ** 16):
+    """
+    Check the trees in a Newick formatted file without creating `Node` objects.
+
+    The file is read in chunks, keeping only the text of the current tree in memory.
+
+    :param fname: file path.
+    :param length_parser: Callable used to check branch lengths; lengths for which it \
+    raises an exception are reported.
+    :return: Generator of one `ValidationReport` per tree, with `problems` being a list of \
+    `(byte offset, message)` pairs. Bytes which cannot be decoded are reported as problems.
+    """
+    splitter, offset, index = TreeSplitter(), 0, 0
+    decoder = codecs.getincrementaldecoder(encoding)(_DECODE_ERRORS)
+
+    with io.open(fname, 'rb') as fp:
+        while True:
+            chunk = fp.read(chunk_size)
+            texts = splitter.feed(decoder.decode(chunk, final=not chunk))
+            if not chunk:
+                texts.extend(splitter.close())
+            for text in texts:
+                trees = list(_validate_trees(text, length_parser))
+                # Convert character offsets to byte offsets in one pass over the text:
+                offsets = sorted(set(
+                    i for t in trees for i in [t[0]] + [p[0] for p in t[4]]))
+                byte_offsets, pos, nbytes = {}, 0, offset
+                for i in offsets:
+                    nbytes += len(text[pos:i].encode(encoding, _DECODE_ERRORS))
+                    byte_offsets[i], pos = nbytes, i
+                for start, tips, internal_nodes, max_depth, problems in trees:
+                    yield ValidationReport(
+                        index,
+                        byte_offsets[start],
+                        tips,
+                        internal_nodes,
+                        max_depth,
+                        [(byte_offsets[i], _UNDECODABLE.sub('\ufffd', msg))
+                         for i, msg in problems])
+                    index += 1
+                offset += len(text.encode(encoding, _DECODE_ERRORS))
+            if not chunk:
+                break
+
+
+def _validate_trees(s, length_parser):
+    """
+    Check the trees in a Newick formatted string, mirroring the checks of `_parse_trees`,
+    but continuing after problems.
+
+    :return: Generator of tuples `(offset, tips, internal nodes, max depth, problems)` - one \
+    per non-blank tree - with `problems` being a list of `(offset, message)` pairs.
+    """
+    # The node currently parsed: [has descendants, label, label offset, has length]
+    problems, names, stack, counts, node, start = [], set(), [], [0, 0, 0], None, None
+    undecodable = [m.start() for m in _UNDECODABLE.finditer(s)][::-1]
+
+    def finish(node):
+        if node[0]:
+            counts[1] += 1
         else:
-            if c == "(":
-                bracket_level += 1
-            elif c == ")":
-                bracket_level -= 1
-            current.append(c)
+            counts[0] += 1
+            name = _unquote(node[1])
+            if name in names:
+                problems.append((node[2], 'duplicate leaf name %s' % node[1]))
+            elif name:
+                names.add(name)
+
+    def result(end):
+        finish(node)
+        for offset, n in reversed(stack):
+            finish(n)
+            problems.append((offset, 'unmatched "("'))
+        while undecodable and undecodable[-1] < end:
+            problems.append((undecodable.pop(), 'undecodable byte'))
+        return (start,) + tuple(counts) + (sorted(problems),)
+
+    try:
+        for kind, value, offset in _tokenize(s):
+            if kind == ';':
+                if node is not None:
+                    yield result(offset)
+                    problems, names, stack, counts, node = [], set(), [], [0, 0, 0], None
+                continue
+            if node is None:
+                node, start = [False, None, None, False], offset
+            if kind == '(':
+                if node[0] or node[1] or node[3]:
+                    problems.append((offset, 'unexpected "("'))
+                node[0] = True
+                stack.append((offset, node))
+                counts[2] = max(counts[2], len(stack))
+                node = [False, None, None, False]
+            elif kind == ',':
+                finish(node)
+                if not stack:
+                    problems.append((offset, 'unmatched ","'))
+                node = [False, None, None, False]
+            elif kind == ')':
+                finish(node)
+                if stack:
+                    node = stack.pop()[1]
+                else:
+                    problems.append((offset, 'unmatched ")"'))
+                    node = [True, None, None, False]
+            elif kind == 'label':
+                if node[1] or node[3]:
+                    problems.append((offset, 'unexpected label %s' % value))
+                elif value[0] != "'" and ("'" in value or ']' in value):
+                    problems.append((offset, 'reserved character in label %s' % value))
+                node[1], node[2] = value, offset
+            elif kind == ':':
+                if node[3]:
+                    problems.append((offset, 'unexpected branch length'))
+                node[3] = True
+                try:
+                    length_parser(value)
+                except Exception:
+                    problems.append((offset, 'invalid branch length %s' % value))
+        if node is not None:
+            problems.append((len(s.rstrip()), 'missing ";"'))
+    except ValueError as e:  # The tokenizer can't recover from unterminated quotes etc.
+        msg, offset = _OFFSET_IN_MESSAGE.match(str(e)).groups()
+        problems.append((int(offset), msg))
+        if node is None:
+            node, start = [False, None, None, False], int(offset)
+    if node is not None:
+        yield result(len(s))
+
+
+def _parse_annotations(comment):
+    """
+    Decode the key-value pairs from BEAST-style `&key=value,...` and NHX-style \
+    `&&NHX:key=value:...` comments; other comments are ignored.
+    """
+    res = {}
+    for c in (comment.split('][') if comment else []):
+        if c.startswith('&&NHX:'):
+            pairs = c[6:].split(':')
+        elif c.startswith('&'):
+            pairs, level, start = [], 0, 1
+            for i, char in enumerate(c):
+                if char in '{(':
+                    level += 1
+                elif char in '})':
+                    level -= 1
+                elif char == ',' and level == 0:
+                    pairs.append(c[start:i])
+                    start = i + 1
+            pairs.append(c[start:])
+        else:
+            continue
+        for pair in pairs:
+            key, sep, value = pair.partition('=')
+            if key.strip():
+                res[key.strip()] = value.strip() if sep else None
+    return res
+
+
+def _format_annotations(comment, annotations):
+    """
+    Encode `annotations` as comment text, replacing the annotation comments in `comment`.
+    """
+    if annotations == _parse_annotations(comment):
+        return comment
+    other = [c for c in (comment.split('][') if comment else []) if not c.startswith('&')]
+    if annotations:
+        pairs = [k if v is None else '%s=%s' % (k, v) for k, v in annotations.items()]
+        if comment and '&&NHX:' in comment:
+            other.insert(0, '&&NHX:' + ':'.join(pairs))
+        else:
+            other.insert(0, '&' + ','.join(pairs))
+    return ']['.join(other) if other else None
+
+
+def _unquote(name):
+    if name and len(name) > 1 and name[0] == name[-1] == "'":
+        return name[1:-1].replace("''", "'").replace("\\'", "'")
+    return name
+
+
+def _scan_label(s, i, stop='(),:;['):
+    """
+    Return the index of the first character at or after `i` which terminates an unquoted
+    label or branch length.
+    """
+    n = len(s)
+    while i < n and s[i] not in stop:
+        i += 1
+    return i
+
+
+_LABEL = re.compile(r'[^(),:;\[]*')
+
+
+def _scan_label_re(s, i):
+    """
+    Same as `_scan_label`, but matching labels longer than one character with a compiled
+    regular expression - which doesn't pay off for shorter ones.
+    """
+    n = len(s)
+    if i >= n or s[i] in '(),:;[':
+        return i
+    i += 1
+    if i >= n or s[i] in '(),:;[':
+        return i
+    return _LABEL.match(s, i + 1).end()
+
+
+def _scan_quoted(s, i):
+    """
+    Return the index of the quote closing the quoted label starting at `i`.
+
+    Quotes within a quoted label are escaped by doubling them or - as found in the wild -
+    by a preceding backslash.
+    """
+    j = i + 1
+    while True:
+        j = s.find("'", j)
+        if j < 0:
+            raise ValueError('unterminated quoted label at offset %s' % i)
+        if s[j - 1] == '\\':
+            j += 1
+        elif s[j + 1:j + 2] == "'":
+            j += 2
+        else:
+            return j
+
+
+def _tokenize_py(s, i=0, scan_label=_scan_label):
+    """
+    Split a Newick formatted string into tokens in a single pass.
+
+    This is the reference implementation, scanning the string character by character.
+
+    :param s: Newick formatted string.
+    :param i: Offset in `s` to start tokenizing at.
+    :param scan_label: Function to find the end of unquoted labels and branch lengths.
+    :return: Generator of `(kind, value, offset)` triples, where `kind` is one of the \
+    structural characters `(),;`, `'label'`, `':'` for a branch length or `'['` for a \
+    comment; `value` is the token text (or `None` for structural tokens) and `offset` \
+    the position of the token in `s`.
+    """
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if c in '(),;':
+            yield c, None, i
+            i += 1
+        elif c.isspace():
+            i += 1
+        elif c == '[':
+            j = s.find(']', i + 1)
+            if j < 0:
+                raise ValueError('unterminated comment at offset %s' % i)
+            yield '[', s[i + 1:j], i
+            i = j + 1
+        elif c == ':':
+            j = scan_label(s, i + 1)
+            yield ':', s[i + 1:j].strip() or None, i
+            i = j
+        elif c == "'":
+            j = _scan_quoted(s, i) + 1
+            yield 'label', s[i:j], i
+            i = j
+        elif c == ']':
+            raise ValueError('unmatched "]" at offset %s' % i)
+        else:
+            j = scan_label(s, i)
+            yield 'label', s[i:j].rstrip(), i
+            i = j
+
+
+def _tokenize_re(s, i=0):
+    """
+    Same as `_tokenize_py`, but scanning unquoted labels and branch lengths with a compiled
+    regular expression, which is about twice as fast for trees with long labels.
+    """
+    return _tokenize_py(s, i, _scan_label_re)
+
+
+# The tokenizer used for parsing:
+_tokenize = _tokenize_re
+
+
+def _parse_trees(tokens, strip_comments=False, **kw):
+    """
+    Assemble `Node` objects from a stream of tokens as returned by `_tokenize`.
+
+    :return: Generator of the `Node` objects for the trees, terminated by ";" or the end \
+    of the token stream.
+    """
+    node, stack = None, []
+    for kind, value, offset in tokens:
+        if kind == ';':
+            if stack:
+                raise ValueError('unmatched braces at offset %s' % offset)
+            if node is not None:
+                yield node
+            node = None
+            continue
+        if node is None:
+            node = Node(**kw)
+        if kind == '(':
+            if node.descendants or node.name or node._length:
+                raise ValueError('unexpected "(" at offset %s' % offset)
+            stack.append(node)
+            node = Node(**kw)
+            stack[-1].add_descendant(node)
+        elif kind == ',':
+            if not stack:
+                raise ValueError('unmatched braces at offset %s' % offset)
+            node = Node(**kw)
+            stack[-1].add_descendant(node)
+        elif kind == ')':
+            if not stack:
+                raise ValueError('unmatched braces at offset %s' % offset)
+            node = stack.pop()
+        elif kind == 'label':
+            if node.name is not None or node._length:
+                raise ValueError('unexpected label at offset %s' % offset)
+            node.name = value or None
+        elif kind == ':':
+            if node._length:
+                raise ValueError('unexpected branch length at offset %s' % offset)
+            node._length = value
+        elif not strip_comments:  # kind == '['
+            node.comment = value if node.comment is None else node.comment + '][' + value
+    if stack:
+        raise ValueError('unmatched braces at end of input')
+    if node is not None:
+        yield node
 
 
 def parse_node(s, strip_comments=False, **kw):
@@ -458,16 +1532,33 @@ def parse_node(s, strip_comments=False, **kw):
     :param kw: Keyword arguments are passed through to `Node.create`.
     :return: `Node` instance.
     """
-    if strip_comments:
-        s = COMMENT.sub('', s)
-    s = s.strip()
-    parts = s.split(')')
-    if len(parts) == 1:
-        descendants, label = [], s
-    else:
-        if not parts[0].startswith('('):
-            raise ValueError('unmatched braces %s' % parts[0][:100])
-        descendants = list(_parse_siblings(')'.join(parts[:-1])[1:], **kw))
-        label = parts[-1]
-    name, length = _parse_name_and_length(label)
-    return Node.create(name=name, length=length, descendants=descendants, **kw)
+    for node in _parse_trees(_tokenize(s), strip_comments=strip_comments, **kw):
+        return node
+    return Node(**kw)
+
+
+def main(args=None):
+    """
+    Command line interface to check Newick files: `newick-validate FILE [FILE ...]`.
+    """
+    parser = argparse.ArgumentParser(
+        description='Check Newick formatted files, reporting problems and tree statistics.')
+    parser.add_argument('files', metavar='FILE', nargs='+')
+    parser.add_argument('--encoding', default='utf8')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only report problems.')
+    args = parser.parse_args(args)
+    valid = True
+    for fname in args.files:
+        for report in validate(fname, encoding=args.encoding):
+            if not args.quiet:
+                print('%s: tree %s: %s tips, %s internal nodes, max depth %s' % (
+                    fname, report.index + 1,
+                    report.tips, report.internal_nodes, report.max_depth))
+            for offset, msg in report.problems:
+                valid = False
+                print('%s:%s: tree %s: %s' % (fname, offset, report.index + 1, msg))
+    return 0 if valid else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
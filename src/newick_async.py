@@ -0,0 +1,85 @@
+# coding: utf8
+"""
+Read Newick formatted trees from asynchronous byte streams, without blocking the event loop.
+
+Requires Python >= 3.6.
+"""
+import codecs
+import functools
+import asyncio
+
+from newick import TreeSplitter, loads
+
+__all__ = ['aiter_load', 'aload']
+
+
+async def _chunks(stream, chunk_size):
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+async def aiter_load(stream,
+                     encoding='utf8',
+                     chunk_size=2 ** 16,
+                     offload_size=2 ** 20,
+                     executor=None,
+                     strip_comments=False,
+                     **kw):
+    """
+    Load trees from an asynchronous stream, yielding each tree as soon as it is complete.
+
+    Chunks are only read from the stream when the consumer asks for the next tree, so at
+    most the text of one tree and one chunk are held in memory.
+
+    :param stream: An object with a `read(n)` coroutine method, like `asyncio.StreamReader`, \
+    or an asynchronous iterable of chunks (`bytes` or `str`).
+    :param encoding: Encoding used to decode `bytes` chunks.
+    :param chunk_size: Number of bytes to request per `read` call.
+    :param offload_size: Trees with texts of at least this size are parsed in `executor` \
+    rather than on the event loop.
+    :param executor: `concurrent.futures.Executor` to use, or `None` for the loop's default.
+    :param strip_comments: Flag signaling whether to strip comments enclosed in square \
+    brackets.
+    :param kw: Keyword arguments are passed through to `Node.create`.
+    :return: Asynchronous generator of `Node` objects.
+    """
+    loop = asyncio.get_event_loop()
+    splitter = TreeSplitter()
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parse = functools.partial(loads, strip_comments=strip_comments, **kw)
+
+    async def parse_texts(texts):
+        for text in texts:
+            if len(text) >= offload_size:
+                trees = await loop.run_in_executor(executor, parse, text)
+            else:
+                trees = parse(text)
+            for tree in trees:
+                yield tree
+
+    async for chunk in _chunks(stream, chunk_size):
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        async for tree in parse_texts(splitter.feed(chunk)):
+            yield tree
+    async for tree in parse_texts(splitter.feed(decoder.decode(b'', final=True))):
+        yield tree
+    async for tree in parse_texts(splitter.close()):
+        yield tree
+
+
+async def aload(stream, **kw):
+    """
+    Load a list of trees from an asynchronous stream.
+
+    :param kw: Keyword arguments are passed through to `aiter_load`.
+    :return: List of Node objects.
+    """
+    return [tree async for tree in aiter_load(stream, **kw)]
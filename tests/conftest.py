@@ -0,0 +1,4 @@
+import sys
+
+# newick_async - and its tests - use syntax introduced in Python 3.6.
+collect_ignore = ['test_newick_async.py'] if sys.version_info < (3, 6) else []
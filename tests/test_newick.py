@@ -1,11 +1,19 @@
 # coding: utf8
 from __future__ import unicode_literals
+import copy
+import io
 import os
+import pickle
 import unittest
 
 import pytest
 from ddt import ddt, data
-from newick import loads, dumps, Node, read, write, parse_node
+
+import newick
+from newick import (
+    loads, dumps, Node, read, write, parse_node, TreeSplitter, validate, TreeCache,
+    TreeCollection,
+)
 
 
 @pytest.fixture
@@ -164,6 +172,21 @@ def test_Node_ascii_art():
     \-C"""
 
 
+def test_Node_ascii_art_maxdepth(tmpdir):
+    tree = loads('((A,B)C,((D,E)F,G,H)I)J;')[0]
+    assert tree.ascii_art(strict=True, maxdepth=1) == r"""
+               /-C (2 leaves)
+--J------------|
+               \-I (4 leaves)"""[1:]
+    assert tree.ascii_art(maxdepth=0) == '\u2500\u2500J (6 leaves)'
+
+    tmp = tmpdir.join('tree.txt')
+    with io.open(str(tmp), 'w', encoding='utf8') as fp:
+        for line in tree.ascii_art_lines():
+            fp.write(line + '\n')
+    assert tmp.read_text('utf8') == tree.ascii_art() + '\n'
+
+
 def test_Node_ascii_art_singleton():
     assert loads('((A,B)C)Ex;')[0].ascii_art(strict=True) == """\
           /-A
@@ -335,10 +358,50 @@ def test_singletons():
 
 def test_comments():
     t = '[&R] (A,B)C [% ] [% ] [%  setBetweenBits = selected ];'
-    with pytest.raises(ValueError):
-        loads(t)
+    tree = loads(t)[0]
+    assert len(list(tree.walk())) == 3
+    assert tree.comment == '&R][% ][% ][%  setBetweenBits = selected '
+    assert tree.annotations == {'R': None}
+    assert tree.newick == '(A,B)C[&R][% ][% ][%  setBetweenBits = selected ]'
     tree = loads(t, strip_comments=True)[0]
     assert len(list(tree.walk())) == 3
+    assert tree.newick == '(A,B)C'
+
+    with pytest.raises(ValueError):
+        loads('(A,B[comment)C;')
+
+
+def test_quoted_labels():
+    tree = loads("('A, (a)':1,'B''s [b]',C)'D;';")[0]
+    assert [n.name for n in tree.walk()] == ["'D;'", "'A, (a)'", "'B''s [b]'", 'C']
+    assert [n.unquoted_name for n in tree.walk()] == ['D;', 'A, (a)', "B's [b]", 'C']
+    assert tree.descendants[0].length == 1.0
+    assert tree.newick == "('A, (a)':1,'B''s [b]',C)'D;'"
+    assert loads("('A\\'s')")[0].descendants[0].unquoted_name == "A's"
+
+    with pytest.raises(ValueError):
+        loads("('A,B)")
+    with pytest.raises(ValueError):
+        Node(name="A,B")
+    assert Node(name="'A,B'").unquoted_name == 'A,B'
+
+
+def test_annotations():
+    tree = loads('(A:1[&&NHX:S=human:E=1.1.1],B[&rate=0.5,hpd={1,2}]:2)C;')[0]
+    a, b = tree.descendants
+    assert a.annotations == {'S': 'human', 'E': '1.1.1'}
+    assert b.annotations == {'rate': '0.5', 'hpd': '{1,2}'}
+    assert b.length == 2.0
+    assert tree.annotations == {}
+
+    a.annotations['S'] = 'mouse'
+    del b.annotations['hpd']
+    tree.annotations['support'] = '0.9'
+    assert tree.newick == \
+        '(A:1[&&NHX:S=mouse:E=1.1.1],B:2[&rate=0.5])C[&support=0.9]'
+
+    a.comment = '&&NHX:S=rat'
+    assert a.annotations == {'S': 'rat'}
 
 
 def test_get_node():
@@ -358,3 +421,329 @@ def test_prune_node():
     t2 = loads(tree)[0]
     t2.prune_by_names(["E"])
     assert t1.newick == t2.newick
+
+
+def test_copy():
+    tree = loads('((A:1,B:2)C:3[&x=1],D)E;')[0]
+    tree.descendants[0].annotations['x'] = '2'
+    clone = tree.copy()
+    assert clone.newick == tree.newick == '((A:1,B:2)C:3[&x=2],D)E'
+    assert clone.descendants[0].ancestor is clone
+    clone.prune_by_names(['A'])
+    clone.descendants[0].annotations['x'] = '3'
+    assert tree.newick == '((A:1,B:2)C:3[&x=2],D)E'
+
+
+def test_induced_subtree():
+    tree = loads('((A:1,(B:1,C:1):1):1,(D:1,E:1):1)F;')[0]
+    assert tree.induced_subtree(['A', 'C']).newick == '(A:1,C:2.0)'
+    assert tree.induced_subtree(['C', 'D']).newick == '(C:3.0,D:2.0)F'
+    assert tree.induced_subtree([tree.get_node('B')]).newick == 'B'
+    assert tree.newick == '((A:1,(B:1,C:1):1):1,(D:1,E:1):1)F'
+
+    sub = tree.descendants[1]
+    assert sub.induced_subtree(['D', 'E']).newick == '(D:1,E:1)'
+    with pytest.raises(ValueError):
+        sub.induced_subtree([tree.get_node('A')])
+    with pytest.raises(ValueError):
+        tree.induced_subtree(['X'])
+    with pytest.raises(ValueError):
+        tree.induced_subtree(['A', 'B', 'X'])
+
+    tree = loads('((A,B)X,(C,AB)Y)R;')[0]
+    assert tree.induced_subtree('AB').newick == 'AB'
+
+    deep = tree = Node('x0')
+    for i in range(1, 3000):
+        deep.add_descendant(Node('x%s' % i, '1'))
+        deep = deep.descendants[0]
+    assert tree.induced_subtree(['x5', 'x2000']).newick == '(x2000:1995.0)x5'
+
+
+def test_pickle_and_deepcopy():
+    tree = loads('((A:1,B:2)C:3[&x=1],D)E;')[0]
+    tree.descendants[0].annotations['x'] = '2'
+    for clone in [pickle.loads(pickle.dumps(tree)), copy.deepcopy(tree)]:
+        assert clone.newick == '((A:1,B:2)C:3[&x=2],D)E'
+        assert clone.descendants[0].ancestor is clone
+        assert clone.descendants[0].length == 3.0
+
+    deep = Node('0')
+    for i in range(1, 5000):
+        deep.add_descendant(Node(str(i)))
+        deep = deep.descendants[0]
+    clone = pickle.loads(pickle.dumps(deep.ancestor.ancestor))
+    assert [n.name for n in clone.descendants[0].descendants] == ['4999']
+    assert clone.ancestor.name == '4996'
+    deep = copy.deepcopy(deep.ancestor)
+    assert deep.ancestor is None and deep.descendants[0].name == '4999'
+
+
+def test_copies_keep_tree_structure():
+    tree = loads('((A,B)C,D)E;')[0]
+    tree.get_node('A').data = {'x': [1]}
+    clone, child = copy.deepcopy([tree, tree.descendants[0]])
+    assert child is clone.descendants[0] and child.ancestor is clone
+    child, clone = copy.deepcopy([tree.descendants[0], tree])
+    assert child is clone.descendants[0] and child.ancestor is clone
+
+    clone, child = pickle.loads(pickle.dumps([tree, tree.get_node('B')]))
+    assert child is clone.descendants[0].descendants[1] and child.ancestor.name == 'C'
+    child, clone = pickle.loads(pickle.dumps([tree.get_node('B'), tree]))
+    assert child is clone.get_node('B') and clone.ancestor is None
+
+    a = clone.get_node('A')
+    assert a.data == {'x': [1]}
+    a.data['x'].append(2)
+    assert tree.get_node('A').data == {'x': [1]}
+    assert tree.copy().get_node('A').data is not tree.get_node('A').data
+
+
+def test_reroot():
+    tree = loads('((A:1,B:2)C:3,(D:4,E:5)F:6)G;')[0]
+    tree.reroot(['D', 'E'])
+    assert tree.newick == '((D:4,E:5)F:6,(A:1,B:2)C:3)'
+
+    tree = loads('((A:1,B:2)C:3,D:4,(E:5,F:6)G:7)H;')[0]
+    tree.reroot(tree.get_node('A'))
+    assert tree.newick == '(A:1,(B:2,(D:4,(E:5,F:6)G:7)H:3)C)'
+    tree.reroot(['E', 'F'])
+    assert tree.newick == '((E:5,F:6)G:7,(D:4,(B:2,A:1)C:3)H)'
+    assert set(tree.get_leaf_names()) == set('ABDEF')
+    assert all(n.ancestor is tree for n in tree.descendants)
+
+    tree = loads('((A,B)C)D;')[0]
+    tree.reroot(['A'])
+    assert tree.newick == '(A,B)'
+
+    with pytest.raises(ValueError):
+        tree.reroot(['A', 'B'])
+    with pytest.raises(ValueError):
+        tree.reroot(['A', 'X'])
+
+    tree = loads('((A,B)X,(C,AB)Y)R;')[0]
+    tree.reroot('AB')
+    assert tree.newick == '(AB,(C,(A,B)X)Y)'
+
+    tree = deep = Node('x0')
+    for i in range(3000):
+        deep.add_descendant(Node('l%s' % i, '1'))
+        deep.add_descendant(Node('x%s' % (i + 1), '1'))
+        deep = deep.descendants[1]
+    tree.reroot(['l2000', 'l2001'])
+    assert [n.name for n in tree.descendants] == ['x2000', 'x1999']
+    assert len(tree._preorder()) == 6001  # New root added, unary old root removed.
+
+
+def test_ladderize():
+    tree = loads('(((A,B),C,(D,(E,F))),G)H;')[0]
+    tree.ladderize()
+    assert tree.newick == '(G,(C,(A,B),(D,(E,F))))H'
+    tree.ladderize(reverse=True)
+    assert tree.newick == '((((E,F),D),(A,B),C),G)H'
+
+
+def test_TreeSplitter():
+    splitter = TreeSplitter()
+    assert splitter.feed("(A,'B;')C;(D") == ["(A,'B;')C;"]
+    assert splitter.feed(",'E\\") == []
+    assert splitter.feed("';''x')[;]") == []
+    assert splitter.feed(';\n') == ["(D,'E\\';''x')[;];"]
+    assert splitter.close() == []
+    assert splitter.feed('(F)') == []
+    assert splitter.close() == ['(F)']
+    assert splitter.feed("(O'Brien,B);(C,D);") == ["(O'Brien,B);", '(C,D);']
+    # Apostrophes only start quoted labels at the start of a token:
+    assert [t for c in "(O'Brien, 'B C'):'1;(D,'E;')" for t in splitter.feed(c)] == \
+        ["(O'Brien, 'B C'):'1;"]
+    assert splitter.close() == ["(D,'E;')"]
+
+
+# Conformance corpus for the tokenizers: Newick strings and the serializations of the
+# parsed trees - or `None` if the string is invalid.
+TOKENIZER_CORPUS = [
+    ('', []),
+    (' ;; ', []),
+    ('A', ['A']),
+    ('(,,(,));', ['(,,(,))']),
+    ('(A, B ,( C D:1 ,E: 2.5 )F)G;\n(H)', ['(A,B,(C D:1,E:2.5)F)G', '(H)']),
+    ("('A,(B)':1,'C''s','D\\'s' , 'E [e]')", ["('A,(B)':1,'C''s','D\\'s','E [e]')"]),
+    ("(O'Brien,X'Y,'Z')", ["(O'Brien,X'Y,'Z')"]),
+    ('(A[c1][c2],B:1[&&NHX:S=x])[&R];', ['(A[c1][c2],B:1[&&NHX:S=x])[&R]']),
+    ('(A:1[a,b;c],B[(x)])', ['(A:1[a,b;c],B[(x)])']),
+    ('(A],B)', ['(A],B)']),
+    ("(A:'1',B)", ["(A:'1',B)"]),
+    ('(A,B', None),
+    ('(A,B));', None),
+    ('(A,B)C(D);', None),
+    ('A B;', ['A B']),
+    ("'A' B;", None),
+    ('(A,B[c)', None),
+    ("(A,'B)", None),
+    ('(],A)', None),
+    ("('A\\'''", None),
+]
+
+
+@pytest.mark.parametrize('tokenize', [newick._tokenize_py, newick._tokenize])
+@pytest.mark.parametrize('s,trees', TOKENIZER_CORPUS)
+def test_tokenizer_conformance(tokenize, s, trees):
+    if trees is None:
+        with pytest.raises(ValueError):
+            list(newick._parse_trees(tokenize(s)))
+    else:
+        assert [t.newick for t in newick._parse_trees(tokenize(s))] == trees
+
+
+def test_tokenizers_agree():
+    with io.open(os.path.join(
+            os.path.dirname(__file__), 'fixtures', 'tree-glottolog-newick.txt'),
+            encoding='utf8') as fp:
+        s = fp.read()
+    assert list(newick._tokenize(s)) == list(newick._tokenize_py(s))
+    for s, _ in TOKENIZER_CORPUS:
+        try:
+            expected = list(newick._tokenize_py(s))
+        except ValueError as e:
+            with pytest.raises(ValueError) as exc:
+                list(newick._tokenize(s))
+            assert str(exc.value) == str(e)
+        else:
+            assert list(newick._tokenize(s)) == expected
+
+
+def test_validate(tmpdir):
+    tmp = tmpdir.join('trees.nwk')
+    tmp.write_text(
+        '[&R] (A:1,Bä:x,(C,A)D)E;\n(F,(G,H);\n(I,J)K;\n(L,M)N[unterminated;', 'utf8')
+    reports = list(validate(str(tmp), chunk_size=3))
+    assert [(r.index, r.offset) for r in reports] == [(0, 0), (1, 26), (2, 36), (3, 44)]
+    assert [(r.tips, r.internal_nodes, r.max_depth) for r in reports] == \
+        [(4, 2, 2), (3, 2, 2), (2, 1, 1), (2, 1, 1)]
+    assert reports[0].problems == [(13, 'invalid branch length x'), (19, 'duplicate leaf name A')]
+    assert reports[1].problems == [(26, 'unmatched "("')]
+    assert reports[2].problems == []
+    assert reports[3].problems == [(50, 'unterminated comment')]
+
+    tmp.write_text("(A,'A')B:1:2,C)(D);E", 'utf8')
+    reports = list(validate(str(tmp)))
+    assert reports[0].problems == [
+        (3, "duplicate leaf name 'A'"),
+        (10, 'unexpected branch length'),
+        (12, 'unmatched ","'),
+        (14, 'unmatched ")"'),
+        (15, 'unexpected "("')]
+    assert reports[1].problems == [(20, 'missing ";"')]
+
+    tmp.write_text("(O'Brien,B);(C,D);(E,E);", 'utf8')
+    reports = list(validate(str(tmp)))
+    assert [(r.offset, r.tips, r.problems) for r in reports] == \
+        [(0, 2, [(1, "reserved character in label O'Brien")]),
+         (12, 2, []),
+         (18, 2, [(21, 'duplicate leaf name E')])]
+    tmp.write_binary(b'(\xc3\xa4,B\xff)C;\n(D,D:\xfe1);(E,F\xc3);')
+    reports = list(validate(str(tmp), chunk_size=4))
+    assert [r.offset for r in reports] == [0, 10, 19]
+    assert reports[0].problems == [(5, 'undecodable byte')]
+    assert reports[1].problems == [
+        (13, 'duplicate leaf name D'),
+        (14, 'invalid branch length \ufffd1'),
+        (15, 'undecodable byte')]
+    assert reports[2].problems == [(23, 'undecodable byte')]
+
+    # All trees in a text are checked:
+    assert [r[:2] for r in newick._validate_trees(' (A,B);;(C,D)', float)] == \
+        [(1, 2), (8, 2)]
+
+    fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'tree-glottolog-newick.txt')
+    assert not any(r.problems for r in validate(fixture))
+
+
+def test_main(tmpdir, capsys):
+    valid, invalid = str(tmpdir.join('valid.nwk')), str(tmpdir.join('invalid.nwk'))
+    write(loads('(A,B)C;(D,(E,F))G;'), valid)
+    with io.open(invalid, 'w', encoding='utf8') as fp:
+        fp.write(u'(A,B:x)C;')
+    assert newick.main([valid]) == 0
+    assert capsys.readouterr()[0].splitlines() == [
+        '%s: tree 1: 2 tips, 1 internal nodes, max depth 1' % valid,
+        '%s: tree 2: 3 tips, 2 internal nodes, max depth 2' % valid]
+    assert newick.main(['-q', valid, invalid]) == 1
+    assert capsys.readouterr()[0].splitlines() == [
+        '%s:4: tree 1: invalid branch length x' % invalid]
+    with io.open(invalid, 'wb') as fp:
+        fp.write(b'(A,B\xff)C;')
+    assert newick.main(['-q', invalid]) == 1
+    assert capsys.readouterr()[0].splitlines() == ['%s:4: tree 1: undecodable byte' % invalid]
+
+
+def test_TreeCache(tmpdir):
+    cache = TreeCache()
+    trees = cache.loads('(A,B)C;(D,E)F;')
+    trees[0].prune_by_names(['A'])
+    assert [t.newick for t in cache.loads('(A,B)C;(D,E)F;')] == ['(A,B)C', '(D,E)F']
+    assert (cache.hits, cache.misses, cache.nodes, len(cache)) == (1, 1, 6, 1)
+    cache.loads('(A,B)C;(D,E)F;', strip_comments=True)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+    tmp = str(tmpdir.join('tree.nwk'))
+    write(loads('(A,B)C;'), tmp)
+    assert cache.read(tmp)[0].newick == '(A,B)C'
+    assert cache.read(tmp)[0].newick == '(A,B)C'
+    assert (cache.hits, cache.misses) == (2, 3)
+    write(loads('(A,B,D)C;'), tmp)
+    os.utime(tmp, (0, 0))
+    assert cache.read(tmp)[0].newick == '(A,B,D)C'
+    assert cache.misses == 4
+
+    cache = TreeCache(max_nodes=5)
+    cache.loads('(A,B)C;')
+    cache.loads('(D,E)F;')
+    assert (len(cache), cache.nodes) == (1, 3)
+    cache.loads('(D,E)F;')
+    cache.loads('(G,H,I,J,K)L;')
+    assert (len(cache), cache.hits) == (1, 1)
+
+    cache = TreeCache(max_bytes=10)
+    cache.loads('(A,B)C;')
+    cache.loads('(D,E)F;')
+    assert cache.bytes == 7
+    cache.loads(u'(\xc4,\xd6)C;')
+    assert cache.bytes == 9
+    cache.loads(u'(\xc4,\xd6,\xdc)C;')
+    assert (len(cache), cache.bytes) == (1, 9)
+    cache.clear()
+    assert (len(cache), cache.nodes, cache.bytes) == (0, 0, 0)
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_TreeCollection(processes):
+    trees = TreeCollection.loads(
+        '((A:1,B:2)X:1,(C:1,D:1):2)R;((A:1,C:1):1,(B:1,D:1)[&p=1]:1);(A,(B,(C,E)));')
+    assert len(trees) == 3
+    assert trees.names == ['R', 'X', 'A', 'B', 'C', 'D', 'E']
+    assert [t.newick for t in trees][1] == '((A:1,C:1):1,(B:1,D:1):1[&p=1])'
+    assert trees.tip_counts() == [4, 4, 4]
+    assert trees.leaf_names()[2] == ['A', 'B', 'C', 'E']
+    assert trees.tree_lengths(processes=processes) == [8.0, 6.0, 0.0]
+
+    freqs = trees.clade_frequencies(processes=processes)
+    assert freqs[frozenset('AB')] == pytest.approx(1 / 3.0)
+    assert freqs[frozenset('ABCD')] == pytest.approx(2 / 3.0)
+    assert frozenset('A') not in freqs
+    assert TreeCollection.loads('((A,B)X,(C,))Y;((B,A),C);').clade_frequencies(
+        processes=processes) == {frozenset('AB'): 1.0, frozenset('ABC'): 1.0}
+
+    trees.prune_by_names(['A', 'B', 'Y'], processes=processes)
+    assert [t.newick for t in trees] == ['((C:1,D:1):2)R', '((C:1):1,(D:1):1[&p=1])', '(((C,E)))']
+    trees.prune_by_names(['C', 'E'], inverse=True, processes=processes)
+    trees.remove_lengths()
+    assert [t.newick for t in trees] == ['((C))R', '((C))', '(((C,E)))']
+
+
+def test_TreeCollection_read():
+    trees = TreeCollection.read(os.path.join(
+        os.path.dirname(__file__), 'fixtures', 'tree-glottolog-newick.txt'))
+    assert trees.tip_counts()[0] == len(trees[0].get_leaves())
+    assert trees[0].newick == read(os.path.join(
+        os.path.dirname(__file__), 'fixtures', 'tree-glottolog-newick.txt'))[0].newick
@@ -0,0 +1,57 @@
+# coding: utf8
+from __future__ import unicode_literals
+import concurrent.futures
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio')
+newick_async = pytest.importorskip('newick_async')
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def _chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_aload_chunks():
+    data = "(A,'B;[x] Fäß')C[&a=1;];\n(D,E)F;\n(G)".encode('utf8')
+    for size in [1, 2, 5, len(data)]:
+        trees = run(newick_async.aload(_chunked(data, size)))
+        assert [t.newick for t in trees] == \
+            ["(A,'B;[x] Fäß')C[&a=1;]", '(D,E)F', '(G)']
+
+
+def test_aiter_load_stream_reader():
+    async def load():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'(A,B)C;(D,E)F;')
+        reader.feed_eof()
+        names = []
+        async for tree in newick_async.aiter_load(reader, chunk_size=3):
+            names.append(tree.name)
+        return names
+
+    assert run(load()) == ['C', 'F']
+
+
+def test_aload_offload():
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        trees = run(newick_async.aload(
+            _chunked(b'(A:1,B:2)C;(D,E)F;', 4),
+            offload_size=10,
+            executor=executor,
+            strip_comments=True))
+    assert trees[0].descendants[1].length == 2.0
+
+
+def test_aload_error():
+    with pytest.raises(ValueError):
+        run(newick_async.aload(_chunked(b'(A,B;', 2)))